@@ -98,6 +98,33 @@ def _parse_arguments(desc, args):
                              'and error message with example of file')
     parser.add_argument('--fake', action='store_true',
                         help='If set, generate fake data for every step')
+    parser.add_argument('--async', dest='async_download', action='store_true',
+                        help='If set, download images concurrently with asyncio '
+                             'using a single HTTP session. Requires the aiohttp '
+                             'package, installable via '
+                             'pip install cellmaps_pipeline[async], '
+                             'otherwise the default multiprocess '
+                             'downloader is used. Ignored if --slurm is set')
+    parser.add_argument('--async_limit_per_host', type=int, default=None,
+                        help='Maximum number of images downloaded at once '
+                             'from the same host when --async is set. '
+                             'Defaults to 4 since the Human Protein Atlas '
+                             'returns errors for more, and failed downloads '
+                             'are skipped. Only raise this for other hosts')
+    parser.add_argument('--hierarchy_cache_dir', default=None,
+                        help='Directory, outside of outdir, where copies of '
+                             'generated hierarchies are cached so a removed '
+                             'hierarchy directory can be restored without '
+                             'regenerating it if its inputs are unchanged. '
+                             'Ignored if --slurm is set. (default None, '
+                             'meaning no caching)')
+    parser.add_argument('--skip_step_logging', action='store_true',
+                        help='If set, pipeline steps do not write output.log '
+                             'and error.log files to their output directories, '
+                             'which lets image download and embedding run '
+                             'concurrently with PPI download and embedding. '
+                             'Log messages still go to standard error as set '
+                             'by -v or --logconf. Ignored if --slurm is set')
     parser.add_argument('--logconf', default=None,
                         help='Path to python logging configuration file in '
                              'this format: https://docs.python.org/3/library/'
@@ -290,7 +317,11 @@ Additional optional fields for registering datasets include
                                                 fake=theargs.fake,
                                                 provenance=json_prov,
                                                 fold=theargs.fold,
-                                                input_data_dict=theargs.__dict__)
+                                                input_data_dict=theargs.__dict__,
+                                                skip_logging=theargs.skip_step_logging,
+                                                async_download=theargs.async_download,
+                                                async_limit_per_host=theargs.async_limit_per_host,
+                                                hierarchy_cache_dir=theargs.hierarchy_cache_dir)
 
         return CellmapsPipeline(outdir=theargs.outdir,
                                 runner=runner,
@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+
+import os
+import asyncio
+import logging
+from tqdm import tqdm
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+from cellmaps_imagedownloader.runner import ImageDownloader
+from cellmaps_imagedownloader.runner import MultiProcessImageDownloader
+
+from cellmaps_pipeline.exceptions import CellmapsPipelineError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncImageDownloader(ImageDownloader):
+    """
+    Downloads images concurrently with :py:mod:`asyncio` using a single
+    `aiohttp <https://docs.aiohttp.org>`__ session so connections are
+    kept alive and reused across downloads.
+
+    .. note::
+
+        Requires the optional ``aiohttp`` package
+
+    """
+    LIMIT = 64
+
+    LIMIT_PER_HOST = MultiProcessImageDownloader.POOL_SIZE
+    """
+    Default maximum number of simultaneous connections to the same host,
+    which matches the number of processes
+    :py:class:`~cellmaps_imagedownloader.runner.MultiProcessImageDownloader`
+    uses, since the `Human Protein Atlas <https://www.proteinatlas.org>`__
+    returns errors when more images are downloaded at once
+    """
+
+    def __init__(self, limit=LIMIT, limit_per_host=LIMIT_PER_HOST,
+                 skip_existing=False):
+        """
+        Constructor
+
+        :param limit: Maximum number of simultaneous downloads and connections
+        :type limit: int
+        :param limit_per_host: Maximum number of simultaneous connections
+                               to the same host. Raising this above
+                               :py:const:`LIMIT_PER_HOST` can cause
+                               failed downloads from the Human Protein Atlas
+        :type limit_per_host: int
+        :param skip_existing: If ``True`` skip download if image file exists and has size
+                              greater then ``0``
+        :type skip_existing: bool
+        """
+        super().__init__()
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._skip_existing = skip_existing
+
+    @staticmethod
+    def is_aiohttp_available():
+        """
+        Checks if the optional ``aiohttp`` package is installed
+
+        :return: ``True`` if ``aiohttp`` can be imported
+        :rtype: bool
+        """
+        return aiohttp is not None
+
+    def download_images(self, download_list=None):
+        """
+        Downloads images returning a list of failed downloads
+
+        :param download_list: Each tuple of format `(image URL, dest file path)`
+        :type download_list: list of tuple
+        :raises CellmapsPipelineError: If ``aiohttp`` is not installed
+        :return: Failed downloads, format of tuple
+                 (`http status code`, `text of error`, (`link`, `destfile`))
+        :rtype: list of tuple
+        """
+        if not AsyncImageDownloader.is_aiohttp_available():
+            raise CellmapsPipelineError('aiohttp package is required by '
+                                        'AsyncImageDownloader')
+
+        num_to_download = len(download_list)
+        logger.info(str(num_to_download) + ' images to download')
+        return asyncio.run(self._download_all(download_list))
+
+    async def _download_all(self, download_list):
+        """
+        Downloads images in **download_list** with **limit**, set in
+        constructor, workers that each take the next download from a
+        shared queue as soon as their current download completes
+
+        :param download_list: Each tuple of format `(image URL, dest file path)`
+        :type download_list: list of tuple
+        :return: Failed downloads
+        :rtype: list of tuple
+        """
+        failed_downloads = []
+        queue = asyncio.Queue()
+        for entry in download_list:
+            queue.put_nowait(entry)
+        connector = aiohttp.TCPConnector(limit=self._limit,
+                                         limit_per_host=self._limit_per_host)
+        t = tqdm(total=len(download_list), desc='Download',
+                 unit='images')
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[self._download_worker(session, queue, t, failed_downloads)
+                                   for _ in range(min(self._limit, len(download_list)))])
+        t.close()
+        return failed_downloads
+
+    async def _download_worker(self, session, queue, t, failed_downloads):
+        """
+        Downloads entries from **queue** until it is empty
+
+        :param session: Session to use for download
+        :type session: :py:class:`aiohttp.ClientSession`
+        :param queue: Queue of `(image URL, dest file path)` tuples
+        :type queue: :py:class:`asyncio.Queue`
+        :param t: Progress bar to update after each download
+        :type t: :py:class:`tqdm.tqdm`
+        :param failed_downloads: Failed downloads are appended to this list
+        :type failed_downloads: list
+        """
+        while True:
+            try:
+                downloadtuple = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            res = await self._download_file(session, downloadtuple)
+            t.update()
+            if res is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('Failed download: ' + str(res))
+                failed_downloads.append(res)
+
+    @staticmethod
+    def _write_file(destfile, data):
+        """
+        Writes **data** to **destfile**
+
+        :param destfile: Path to file
+        :type destfile: str
+        :param data: Data to write
+        :type data: bytes
+        """
+        with open(destfile, 'wb') as f:
+            f.write(data)
+
+    async def _download_file(self, session, downloadtuple):
+        """
+        Downloads file pointed to by 'download_url' to
+        'destfile'. The file is written in the default executor
+        so the event loop is not blocked
+
+        :param session: Session to use for download
+        :type session: :py:class:`aiohttp.ClientSession`
+        :param downloadtuple: `(download link, dest file path)`
+        :type downloadtuple: tuple
+        :return: None upon success otherwise:
+                 `(http status code, text from request, downloadtuple)`
+        :rtype: tuple
+        """
+        if self._skip_existing is True and os.path.isfile(downloadtuple[1]) \
+                and os.path.getsize(downloadtuple[1]) > 0:
+            return None
+        logger.debug('Downloading ' + downloadtuple[0] + ' to ' + downloadtuple[1])
+        try:
+            async with session.get(downloadtuple[0]) as r:
+                if r.status != 200:
+                    # error pages are not always valid in the
+                    # declared encoding, keep the status regardless
+                    return r.status, await r.text(errors='replace'), downloadtuple
+                data = await r.read()
+            await asyncio.get_running_loop().run_in_executor(None, AsyncImageDownloader._write_file,
+                                                             downloadtuple[1], data)
+            return None
+        except aiohttp.ClientResponseError as e:
+            return -1, str(e), downloadtuple
+        except aiohttp.ClientConnectionError as e:
+            return -2, str(e), downloadtuple
+        except asyncio.TimeoutError as e:
+            return -3, str(e), downloadtuple
+        except aiohttp.ClientError as e:
+            return -4, str(e), downloadtuple
+        except Exception as e:
+            return -5, str(e), downloadtuple
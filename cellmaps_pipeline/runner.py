@@ -4,43 +4,229 @@ import os
 import warnings
 import logging
 import time
-import networkx as nx
-from cellmaps_imagedownloader.exceptions import CellMapsImageDownloaderError
+import functools
+import hashlib
+import shutil
+import multiprocessing
+import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 from cellmaps_utils import logutils
 from cellmaps_utils import constants
-from cellmaps_utils.provenance import ProvenanceUtil
-
-from cellmaps_imagedownloader.runner import MultiProcessImageDownloader
-from cellmaps_imagedownloader.runner import FakeImageDownloader
-from cellmaps_imagedownloader.runner import CellmapsImageDownloader
-from cellmaps_imagedownloader.runner import CM4AICopyDownloader
-from cellmaps_imagedownloader.gene import ImageGeneNodeAttributeGenerator, CM4AITableConverter
-from cellmaps_ppidownloader.runner import CellmapsPPIDownloader
-from cellmaps_ppidownloader.gene import APMSGeneNodeAttributeGenerator, CM4AIGeneNodeAttributeGenerator
-from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator
-from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
-from cellmaps_image_embedding.runner import CellmapsImageEmbedder
-from cellmaps_image_embedding.runner import FakeEmbeddingGenerator
-from cellmaps_image_embedding.runner import DensenetEmbeddingGenerator
-from cellmaps_coembedding.runner import MuseCoEmbeddingGenerator
-from cellmaps_coembedding.runner import FakeCoEmbeddingGenerator
-from cellmaps_coembedding.runner import CellmapsCoEmbedder
-from cellmaps_generate_hierarchy.ppi import CosineSimilarityPPIGenerator
-from cellmaps_generate_hierarchy.hierarchy import CDAPSHiDeFHierarchyGenerator
-from cellmaps_generate_hierarchy.maturehierarchy import HiDeFHierarchyRefiner
-from cellmaps_generate_hierarchy.runner import CellmapsGenerateHierarchy
-from cellmaps_generate_hierarchy.hcx import HCXFromCDAPSCXHierarchy
-from cellmaps_imagedownloader.proteinatlas import ProteinAtlasReader, CM4AIImageCopyTupleGenerator
-from cellmaps_imagedownloader.proteinatlas import ProteinAtlasImageUrlReader
-from cellmaps_imagedownloader.proteinatlas import ImageDownloadTupleGenerator
-from cellmaps_imagedownloader.proteinatlas import LinkPrefixImageDownloadTupleGenerator
-from cellmaps_hierarchyeval.runner import CellmapshierarchyevalRunner
 
 import cellmaps_pipeline
 from cellmaps_pipeline.exceptions import CellmapsPipelineError
 
 logger = logging.getLogger(__name__)
 
+_SLURM_TPL = string.Template('#!/bin/bash\n\n'
+                             '#SBATCH --job-name=$job_name\n'
+                             '#SBATCH --chdir=$outdir\n'
+                             '#SBATCH --output=%x.%j.out\n'
+                             '$optional_directives'
+                             '#SBATCH --ntasks=1\n'
+                             '#SBATCH --cpus-per-task=$cpus_per_task\n'
+                             '#SBATCH --mem=$mem\n'
+                             '#SBATCH --time=$allocated_time\n\n'
+                             'echo $$SLURM_JOB_ID\n'
+                             'echo $$HOSTNAME\n')
+"""
+Template for SLURM job directives written at start of every
+job script by :py:class:`SLURMPipelineRunner`
+"""
+
+
+def _get_available_cpus(reserved_cpus=0):
+    """
+    Gets number of CPUs not reserved for work running
+    at the same time, such as node2vec workers
+
+    :param reserved_cpus: Number of CPUs reserved
+    :type reserved_cpus: int
+    :return: Number of CPUs, always at least ``1``
+    :rtype: int
+    """
+    return max(1, (os.cpu_count() or 1) - reserved_cpus)
+
+
+def _get_max_workers(num_tasks, reserved_cpus=0):
+    """
+    Gets number of worker processes to use for running **num_tasks**
+    tasks in parallel, which is never more than the number of CPUs
+    less **reserved_cpus**
+
+    :param num_tasks: Number of tasks to run
+    :type num_tasks: int
+    :param reserved_cpus: Number of CPUs reserved for other work
+    :type reserved_cpus: int
+    :return: Number of workers, always at least ``1``
+    :rtype: int
+    """
+    return max(1, min(num_tasks, _get_available_cpus(reserved_cpus)))
+
+
+def _get_threads_per_worker(num_workers, reserved_cpus=0):
+    """
+    Gets number of threads each of **num_workers** worker processes
+    should use so together they do not use more threads than CPUs
+    less **reserved_cpus**
+
+    :param num_workers: Number of worker processes
+    :type num_workers: int
+    :param reserved_cpus: Number of CPUs reserved for other work
+    :type reserved_cpus: int
+    :return: Number of threads, always at least ``1``
+    :rtype: int
+    """
+    return max(1, _get_available_cpus(reserved_cpus) // max(1, num_workers))
+
+
+def _set_torch_num_threads(num_threads):
+    """
+    Limits number of threads torch uses in this process
+    to **num_threads**
+
+    :param num_threads: Number of threads, if ``None`` torch
+                        default is kept
+    :type num_threads: int
+    """
+    if num_threads is None:
+        return
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def _get_file_hash(path):
+    """
+    Gets :py:func:`hashlib.blake2b` hex digest of contents of file
+    specified by **path**
+
+    :param path: Path to file
+    :type path: str
+    :return: Hex digest of file contents
+    :rtype: str
+    """
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(functools.partial(f.read, 1048576), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _build_image_coembed_tuples(outdir, fold_tuple):
+    """
+    Builds tuples containing fold number and directories for image
+    embedding and coembedding. Results are cached per **outdir**
+    and **fold_tuple** so repeated runner instantiations reuse them
+
+    :param outdir: Absolute path to output directory
+    :type outdir: str
+    :param fold_tuple: Folds of the data
+    :type fold_tuple: tuple
+    :return: (fold, image embedding dir, coembedding dir) tuples
+    :rtype: tuple
+    """
+    logger.debug('Fold values: ' + str(fold_tuple))
+    image_coembed_tuples = tuple((fold_val,
+                                  os.path.join(outdir,
+                                               constants.IMAGE_EMBEDDING_STEP_DIR +
+                                               str(fold_val)),
+                                  os.path.join(outdir,
+                                               constants.COEMBEDDING_STEP_DIR +
+                                               str(fold_val)))
+                                 for fold_val in fold_tuple)
+    logger.debug('Value of image_coembed_tuples: ' +
+                 str(image_coembed_tuples))
+    return image_coembed_tuples
+
+
+def _run_image_embed_fold(image_coembed_tuple, image_dir, model_path,
+                          fake, input_data_dict, skip_logging=False,
+                          num_threads=None):
+    """
+    Runs image embedding for a single fold. This is a module level
+    function so it can be pickled and run in a separate process
+
+    :param image_coembed_tuple: (fold, image embedding dir, coembedding dir)
+    :type image_coembed_tuple: tuple
+    :param image_dir: Image download directory
+    :type image_dir: str
+    :param model_path: URL or path to model file for image embedding
+    :type model_path: str
+    :param fake: If ``True`` use fake embedding generator
+    :type fake: bool
+    :param input_data_dict: Dictionary containing input data configurations
+    :type input_data_dict: dict
+    :param skip_logging: If ``True`` skip logging
+    :type skip_logging: bool
+    :param num_threads: Number of threads torch should use
+    :type num_threads: int
+    :return: Exit code of :py:meth:`~cellmaps_image_embedding.runner.CellmapsImageEmbedder.run`
+    :rtype: int
+    """
+    from cellmaps_image_embedding.runner import CellmapsImageEmbedder
+    from cellmaps_image_embedding.runner import FakeEmbeddingGenerator
+    from cellmaps_image_embedding.runner import DensenetEmbeddingGenerator
+
+    if fake is True:
+        gen = FakeEmbeddingGenerator(image_dir)
+    else:
+        _set_torch_num_threads(num_threads)
+        gen = DensenetEmbeddingGenerator(image_dir,
+                                         outdir=image_coembed_tuple[1],
+                                         model_path=model_path,
+                                         fold=int(image_coembed_tuple[0]))
+    return CellmapsImageEmbedder(outdir=image_coembed_tuple[1],
+                                 inputdir=image_dir,
+                                 embedding_generator=gen,
+                                 skip_logging=skip_logging,
+                                 input_data_dict=input_data_dict).run()
+
+
+def _run_coembed_fold(image_coembed_tuple, ppi_embed_dir, fake,
+                      input_data_dict, skip_logging=False,
+                      num_threads=None):
+    """
+    Runs co-embedding for a single fold. This is a module level
+    function so it can be pickled and run in a separate process
+
+    :param image_coembed_tuple: (fold, image embedding dir, coembedding dir)
+    :type image_coembed_tuple: tuple
+    :param ppi_embed_dir: PPI embedding directory
+    :type ppi_embed_dir: str
+    :param fake: If ``True`` use fake co-embedding generator
+    :type fake: bool
+    :param input_data_dict: Dictionary containing input data configurations
+    :type input_data_dict: dict
+    :param skip_logging: If ``True`` skip logging
+    :type skip_logging: bool
+    :param num_threads: Number of threads torch should use
+    :type num_threads: int
+    :return: Exit code of :py:meth:`~cellmaps_coembedding.runner.CellmapsCoEmbedder.run`
+    :rtype: int
+    """
+    from cellmaps_coembedding.runner import MuseCoEmbeddingGenerator
+    from cellmaps_coembedding.runner import FakeCoEmbeddingGenerator
+    from cellmaps_coembedding.runner import CellmapsCoEmbedder
+
+    if fake:
+        gen = FakeCoEmbeddingGenerator(ppi_embeddingdir=ppi_embed_dir,
+                                       image_embeddingdir=image_coembed_tuple[1])
+    else:
+        _set_torch_num_threads(num_threads)
+        gen = MuseCoEmbeddingGenerator(outdir=image_coembed_tuple[2],
+                                       ppi_embeddingdir=ppi_embed_dir,
+                                       image_embeddingdir=image_coembed_tuple[1])
+    return CellmapsCoEmbedder(outdir=image_coembed_tuple[2],
+                              inputdirs=[image_coembed_tuple[1],
+                                         ppi_embed_dir],
+                              embedding_generator=gen,
+                              skip_logging=skip_logging,
+                              input_data_dict=input_data_dict).run()
+
 
 class PipelineRunner(object):
     """
@@ -62,27 +248,13 @@ class PipelineRunner(object):
         Generate tuples containing fold number and directories for image embedding and coembedding.
 
         :param fold: List of integers representing the folds of the data.
-        :return: A list of tuples, each containing the fold number, image embedding directory,
+        :return: A tuple of tuples, each containing the fold number, image embedding directory,
                  and coembedding directory paths.
         """
         if fold is None:
             raise CellmapsPipelineError('Fold cannot be None')
 
-        image_coembed_tuples = []
-        logger.debug('Fold values: ' + str(fold))
-        for fold_val in fold:
-            image_embed_dir = os.path.join(self._outdir,
-                                           constants.IMAGE_EMBEDDING_STEP_DIR +
-                                           str(fold_val))
-            co_embed_dir = os.path.join(self._outdir,
-                                        constants.COEMBEDDING_STEP_DIR +
-                                        str(fold_val))
-
-            image_coembed_tuples.append((fold_val, image_embed_dir,
-                                         co_embed_dir))
-        logger.debug('Value of image_coembed_tuples: ' +
-                     str(image_coembed_tuples))
-        return image_coembed_tuples
+        return _build_image_coembed_tuples(self._outdir, tuple(fold))
 
     def run(self):
         """
@@ -146,6 +318,8 @@ class SLURMPipelineRunner(PipelineRunner):
                                                                                                    baitlist)
         self._model_path = model_path
         self._fake = fake
+        self._fake_embedder_flag = '--fake_embedder' if self._fake is True else ''
+        self._fake_embedding_flag = '--fake_embedding' if self._fake is True else ''
         self._provenance = provenance if provenance is None or os.path.isabs(provenance) else os.path.join(os.getcwd(),
                                                                                                            provenance)
         self._proteinatlasxml = proteinatlasxml
@@ -162,53 +336,74 @@ class SLURMPipelineRunner(PipelineRunner):
 
         self._image_coembed_tuples = self._get_image_coembed_tuples(fold)
 
+        # SLURM job array indices, the array task id is the fold value
+        self._fold_array = ','.join(str(t[0]) for t in self._image_coembed_tuples)
+        # fold is appended by array task at runtime
+        self._image_embed_dir_prefix = os.path.join(self._outdir,
+                                                    constants.IMAGE_EMBEDDING_STEP_DIR)
+        self._coembed_dir_prefix = os.path.join(self._outdir,
+                                                constants.COEMBEDDING_STEP_DIR)
+
         self._hierarchy_dir = os.path.join(self._outdir,
                                            constants.HIERARCHY_STEP_DIR)
 
         self._hierarchy_eval_dir = os.path.join(self._outdir,
                                                 constants.HIERARCHYEVAL_STEP_DIR)
 
-    def _write_slurm_directives(self, out=None,
-                                allocated_time='4:00:00',
-                                mem='32G', cpus_per_task='4',
-                                job_name='cellmaps_pipeline'):
+    def _get_slurm_directives(self, allocated_time='4:00:00',
+                              mem='32G', cpus_per_task='4',
+                              job_name='cellmaps_pipeline'):
         """
-        Writes SLURM job directives to a bash script file.
+        Gets SLURM job directives for a bash script file as a single string.
 
-        :param out: File handle to write the SLURM directives.
         :param allocated_time: String specifying the maximum time allowed for the job.
         :param mem: String specifying the memory allocated for the job.
         :param cpus_per_task: String specifying the number of CPUs per task.
         :param job_name: String specifying the name of the SLURM job.
+        :return: SLURM job directives
+        :rtype: str
         """
-        out.write('#!/bin/bash\n\n')
-        out.write('#SBATCH --job-name=' + str(job_name) + '\n')
-        out.write('#SBATCH --chdir=' + self._outdir + '\n')
-
-        out.write('#SBATCH --output=%x.%j.out\n')
-        if self._slurm_partition is not None:
-            out.write('#SBATCH --partition=' + self._slurm_partition + '\n')
-        if self._slurm_account is not None:
-            out.write('#SBATCH --account=' + self._slurm_account + '\n')
-        out.write('#SBATCH --ntasks=1\n')
-        out.write('#SBATCH --cpus-per-task=' + str(cpus_per_task) + '\n')
-        out.write('#SBATCH --mem=' + str(mem) + '\n')
-        out.write('#SBATCH --time=' + str(allocated_time) + '\n\n')
-
-        out.write('echo $SLURM_JOB_ID\n')
-        out.write('echo $HOSTNAME\n')
-
-    def _write_directory_check(self, out, directory):
+        optional_directives = ''.join([f'#SBATCH --{name}={value}\n'
+                                       for name, value in (('partition', self._slurm_partition),
+                                                           ('account', self._slurm_account))
+                                       if value is not None])
+        return _SLURM_TPL.substitute(job_name=job_name,
+                                     outdir=self._outdir,
+                                     optional_directives=optional_directives,
+                                     cpus_per_task=cpus_per_task,
+                                     mem=mem,
+                                     allocated_time=allocated_time)
+
+    def _get_directory_check(self, directory):
         """
-        Writes a directory check script to the provided file handle, which exits the job if the directory exists.
+        Gets directory check script, which exits the job if the directory exists.
 
-        :param out: File handle to write the directory check script.
         :param directory: The directory to check for existence.
+        :return: Directory check script
+        :rtype: str
         """
-        out.write(f"if [ -d \"{directory}\" ]; then\n")
-        out.write(f"    echo \"Directory {directory} exists. Skipping job.\"\n")
-        out.write("    exit 0\n")
-        out.write("fi\n\n")
+        return (f"if [ -d \"{directory}\" ]; then\n"
+                f"    echo \"Directory {directory} exists. Skipping job.\"\n"
+                f"    exit 0\n"
+                f"fi\n\n")
+
+    def _write_job_script(self, filename, parts):
+        """
+        Writes **parts** joined together to **filename** in the output directory
+        with a single write call and makes the file executable.
+
+        :param filename: Name of bash script file to write
+        :type filename: str
+        :param parts: Strings that make up the bash script
+        :type parts: list
+        :return: **filename**
+        :rtype: str
+        """
+        script_path = os.path.join(self._outdir, filename)
+        with open(script_path, 'w', buffering=-1, encoding='utf-8') as f:
+            f.write(''.join(parts))
+        os.chmod(script_path, 0o755)
+        return filename
 
     def _generate_download_images_command(self):
         """
@@ -216,24 +411,22 @@ class SLURMPipelineRunner(PipelineRunner):
 
         :return: The filename of the bash script generated for downloading images.
         """
-        with open(os.path.join(self._outdir, 'imagedownloadjob.sh'), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='imagedownload')
-            self._write_directory_check(f, self._image_dir)
-            if self._cm4ai_image != None:
-                input_arg = '--cm4ai_table ' + self._cm4ai_image
-            elif self._samples != None and self._unique != None:
-                input_arg = '--samples ' + self._samples + ' --unique ' + self._unique
-            else:
-                raise CellmapsPipelineError(
-                    'You must provide cm4ai_table parameter or samples and unque parameters.')
-            if self._provenance == None:
-                raise CellmapsPipelineError(
-                    'You must provide provenance parameter')
-            f.write('cellmaps_imagedownloadercmd.py ' + self._image_dir +
-                    ' --provenance ' + self._provenance + ' ' + input_arg + '\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, 'imagedownloadjob.sh'), 0o755)
-        return 'imagedownloadjob.sh'
+        if self._cm4ai_image is not None:
+            input_arg = '--cm4ai_table ' + self._cm4ai_image
+        elif self._samples is not None and self._unique is not None:
+            input_arg = '--samples ' + self._samples + ' --unique ' + self._unique
+        else:
+            raise CellmapsPipelineError(
+                'You must provide cm4ai_table parameter or samples and unque parameters.')
+        if self._provenance is None:
+            raise CellmapsPipelineError(
+                'You must provide provenance parameter')
+        return self._write_job_script('imagedownloadjob.sh',
+                                      [self._get_slurm_directives(job_name='imagedownload'),
+                                       self._get_directory_check(self._image_dir),
+                                       'cellmaps_imagedownloadercmd.py ' + self._image_dir +
+                                       ' --provenance ' + self._provenance + ' ' + input_arg + '\n',
+                                       'exit $?\n'])
 
     def _generate_download_ppi_command(self):
         """
@@ -241,42 +434,39 @@ class SLURMPipelineRunner(PipelineRunner):
 
         :return: ppidownloadjob.sh
         """
-        with open(os.path.join(self._outdir, 'ppidownloadjob.sh'), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='ppidownload')
-            self._write_directory_check(f, self._ppi_dir)
-            if self._cm4ai_apms != None:
-                input_arg = '--cm4ai_table ' + self._cm4ai_apms
-            elif self._edgelist != None and self._baitlist != None:
-                input_arg = '--edgelist ' + self._edgelist + ' --baitlist ' + self._baitlist
-            else:
-                raise CellmapsPipelineError(
-                    'You must provide edgelist and baitlist parameters.')
-            if self._provenance == None:
-                raise CellmapsPipelineError(
-                    'You must provide provenance parameter')
-            f.write('cellmaps_ppidownloadercmd.py ' + self._ppi_dir +
-                    ' --provenance ' + self._provenance + ' ' + input_arg + '\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, 'ppidownloadjob.sh'), 0o755)
-        return 'ppidownloadjob.sh'
-
-    def _generate_embed_image_command(self, fold=1):
-        """
-        Generates a bash script for embedding images based on the specified fold and writes it to a file in the output directory.
-
-        :param fold: The data fold to process for image embedding.
+        if self._cm4ai_apms is not None:
+            input_arg = '--cm4ai_table ' + self._cm4ai_apms
+        elif self._edgelist is not None and self._baitlist is not None:
+            input_arg = '--edgelist ' + self._edgelist + ' --baitlist ' + self._baitlist
+        else:
+            raise CellmapsPipelineError(
+                'You must provide edgelist and baitlist parameters.')
+        if self._provenance is None:
+            raise CellmapsPipelineError(
+                'You must provide provenance parameter')
+        return self._write_job_script('ppidownloadjob.sh',
+                                      [self._get_slurm_directives(job_name='ppidownload'),
+                                       self._get_directory_check(self._ppi_dir),
+                                       'cellmaps_ppidownloadercmd.py ' + self._ppi_dir +
+                                       ' --provenance ' + self._provenance + ' ' + input_arg + '\n',
+                                       'exit $?\n'])
+
+    def _generate_embed_image_command(self):
+        """
+        Generates a bash script for embedding images and writes it to a file in the output directory.
+        The script is meant to be submitted as a SLURM job array where the array task id is the fold.
+
         :return: The filename of the bash script generated for image embedding.
         """
-        filename = 'imageembedjob' + str(fold) + '.sh'
-        with open(os.path.join(self._outdir, filename), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='imageembed' + str(fold))
-            self._write_directory_check(f, self._image_coembed_tuples[fold - 1][1])
-            fake = '--fake_embedder' if self._fake is True else ""
-            f.write('cellmaps_image_embeddingcmd.py ' + self._image_coembed_tuples[fold - 1][1] +
-                    ' --fold ' + str(fold) + ' --inputdir ' + self._image_dir + ' ' + fake + ' -vvvv\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, filename), 0o755)
-        return filename
+        return self._write_job_script('imageembedjob.sh',
+                                      [self._get_slurm_directives(job_name='imageembed'),
+                                       'fold=$SLURM_ARRAY_TASK_ID\n',
+                                       'image_embed_dir=' + self._image_embed_dir_prefix + '${fold}\n\n',
+                                       self._get_directory_check('$image_embed_dir'),
+                                       'cellmaps_image_embeddingcmd.py $image_embed_dir'
+                                       ' --fold $fold --inputdir ' + self._image_dir + ' ' + self._fake_embedder_flag +
+                                       ' -vvvv\n',
+                                       'exit $?\n'])
 
     def _generate_embed_ppi_command(self):
         """
@@ -284,119 +474,119 @@ class SLURMPipelineRunner(PipelineRunner):
 
         :return: ppiembedjob.sh
         """
-        with open(os.path.join(self._outdir, 'ppiembedjob.sh'), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='ppiembed')
-            self._write_directory_check(f, self._ppi_embed_dir)
-            fake = "--fake_embedder" if self._fake is True else ""
-            f.write('cellmaps_ppi_embeddingcmd.py ' + self._ppi_embed_dir +
-                    ' --inputdir ' + self._ppi_dir + ' ' + fake + ' -vvvv\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, 'ppiembedjob.sh'), 0o755)
-        return 'ppiembedjob.sh'
-
-    def _generate_coembed_command(self, fold=1):
-        """
-        Generates a bash script for co-embedding of image and PPI data based on the specified fold and writes it to a file in the output directory.
-
-        :param fold: The data fold to process for co-embedding.
-        :return: coembedjob.sh
-        """
-        filename = 'coembeddingjob' + str(fold) + '.sh'
-        with open(os.path.join(self._outdir, filename), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='coembedding' + str(fold))
-            self._write_directory_check(f, self._image_coembed_tuples[fold - 1][2])
-            fake = '--fake_embedding' if self._fake is True else ""
-            f.write('cellmaps_coembeddingcmd.py ' + self._image_coembed_tuples[fold - 1][
-                2] + ' --ppi_embeddingdir ' + self._ppi_embed_dir +
-                    ' --image_embeddingdir ' + self._image_coembed_tuples[fold - 1][1] + ' ' + fake + ' -vvvv\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, filename), 0o755)
-        return filename
+        return self._write_job_script('ppiembedjob.sh',
+                                      [self._get_slurm_directives(job_name='ppiembed'),
+                                       self._get_directory_check(self._ppi_embed_dir),
+                                       'cellmaps_ppi_embeddingcmd.py ' + self._ppi_embed_dir +
+                                       ' --inputdir ' + self._ppi_dir + ' ' + self._fake_embedder_flag + ' -vvvv\n',
+                                       'exit $?\n'])
+
+    def _generate_coembed_command(self):
+        """
+        Generates a bash script for co-embedding of image and PPI data and writes it to a file in the output directory.
+        The script is meant to be submitted as a SLURM job array where the array task id is the fold.
+
+        :return: coembeddingjob.sh
+        """
+        return self._write_job_script('coembeddingjob.sh',
+                                      [self._get_slurm_directives(job_name='coembedding'),
+                                       'fold=$SLURM_ARRAY_TASK_ID\n',
+                                       'image_embed_dir=' + self._image_embed_dir_prefix + '${fold}\n',
+                                       'coembed_dir=' + self._coembed_dir_prefix + '${fold}\n\n',
+                                       self._get_directory_check('$coembed_dir'),
+                                       'cellmaps_coembeddingcmd.py $coembed_dir'
+                                       ' --ppi_embeddingdir ' + self._ppi_embed_dir +
+                                       ' --image_embeddingdir $image_embed_dir'
+                                       ' ' + self._fake_embedding_flag + ' -vvvv\n',
+                                       'exit $?\n'])
 
     def _generate_hierarchy_command(self):
         """
         Generates a bash script for constructing a hierarchy from the co-embedded data.
         :return: hierarchyjob.sh
         """
-        with open(os.path.join(self._outdir, 'hierarchyjob.sh'), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='hierarchy')
-            self._write_directory_check(f, self._hierarchy_dir)
-            f.write('cellmaps_generate_hierarchycmd.py ' + self._hierarchy_dir + ' --coembedding_dirs ')
-            for image_coembed_tuple in self._image_coembed_tuples:
-                f.write(image_coembed_tuple[2] + ' ')
-            f.write('--gene_node_attributes ' + self._ppi_dir + ' ' + self._image_dir + ' ')
-            f.write('-vvvv\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, 'hierarchyjob.sh'), 0o755)
-        return 'hierarchyjob.sh'
+        coembed_dirs = ' '.join(t[2] for t in self._image_coembed_tuples)
+        return self._write_job_script('hierarchyjob.sh',
+                                      [self._get_slurm_directives(job_name='hierarchy'),
+                                       self._get_directory_check(self._hierarchy_dir),
+                                       'cellmaps_generate_hierarchycmd.py ' + self._hierarchy_dir +
+                                       ' --coembedding_dirs ' + coembed_dirs + ' ',
+                                       '--gene_node_attributes ' + self._ppi_dir + ' ' + self._image_dir + ' ',
+                                       '-vvvv\n',
+                                       'exit $?\n'])
 
     def _generate_hierarchyeval_command(self):
         """
         Generates a bash script for evaluating the generated hierarchy.
         :return: hierarchyevaljob.sh
         """
-        with open(os.path.join(self._outdir, 'hierarchyevaljob.sh'), 'w') as f:
-            self._write_slurm_directives(out=f, job_name='hierarchyeval')
-            self._write_directory_check(f, self._hierarchy_eval_dir)
-            f.write('cellmaps_hierarchyevalcmd.py ' + self._hierarchy_eval_dir + ' --hierarchy_dir ' +
-                    self._hierarchy_dir)
-            f.write(' -vvvv\n')
-            f.write('exit $?\n')
-        os.chmod(os.path.join(self._outdir, 'hierarchyevaljob.sh'), 0o755)
-        return 'hierarchyevaljob.sh'
+        return self._write_job_script('hierarchyevaljob.sh',
+                                      [self._get_slurm_directives(job_name='hierarchyeval'),
+                                       self._get_directory_check(self._hierarchy_eval_dir),
+                                       'cellmaps_hierarchyevalcmd.py ' + self._hierarchy_eval_dir +
+                                       ' --hierarchy_dir ' + self._hierarchy_dir,
+                                       ' -vvvv\n',
+                                       'exit $?\n'])
 
     def run(self):
         """
         Runs pipelines
         """
-        slurmjobfile = os.path.join(self._outdir, 'slurm_cellmaps_job.sh')
-        with open(slurmjobfile, 'w') as f:
-            f.write('#! /bin/bash\n\n')
-            f.write('# image download no dependencies\n')
-            f.write('image_download_job=$(sbatch ' +
-                    self._generate_download_images_command() + ' | awk \'{print $4}\')\n\n')
-
-            f.write('# ppi download no dependencies\n')
-            f.write('ppi_download_job=$(sbatch ' +
-                    self._generate_download_ppi_command() + ' | awk \'{print $4}\')\n\n')
-
-            f.write('# ppi embed\n')
-            f.write('ppi_embed_job=$(sbatch --dependency=afterok:$ppi_download_job ' +
-                    self._generate_embed_ppi_command() + ' | awk \'{print $4}\')\n\n')
-
-            embed_job_names = ['$ppi_embed_job']
-            for image_coembed_tuple in self._image_coembed_tuples:
-                # [0] = fold value
-                # [1] = image embedding dir
-                # [2] = outdir
-                f.write('# image embed\n')
-                f.write('image_embed_job' + str(
-                    image_coembed_tuple[0]) + '=$(sbatch --dependency=afterok:$image_download_job ' +
-                        self._generate_embed_image_command(fold=image_coembed_tuple[0]) + ' | awk \'{print $4}\')\n\n')
-                f.write(
-                    '# fold' + str(image_coembed_tuple[0]) + ' co-embedding\n')
-                embed_job_name = 'f' + str(image_coembed_tuple[0]) + '_coembed_job'
-                f.write(embed_job_name + '=$(sbatch --dependency=afterok:$image_embed_job' + str(
-                    image_coembed_tuple[0]) + ' ' +
-                        self._generate_coembed_command(fold=image_coembed_tuple[0]) + ' | awk \'{print $4}\')\n\n')
-                embed_job_names.append('$' + embed_job_name)
-            dependency_str = ':'.join(embed_job_names)
-            f.write('# hierarchy\n')
-            f.write(
-                'hierarchy_job=$(sbatch --dependency=afterok:' + dependency_str + ' ' + self._generate_hierarchy_command() + ' | awk \'{print $4}\')\n\n')
-            f.write('echo "job submitted; here is ID of final hierarchy job: $hierarchy_job"\n')
-            f.write('# hierarchyeval\n')
-            f.write(
-                'hierarchyeval_job=$(sbatch --dependency=afterok:$hierarchy_job ' +
-                self._generate_hierarchyeval_command() + ' | awk \'{print $4}\')\n\n')
-            f.write('echo "job submitted; here is ID of final hierarchyeval job: $hierarchyeval_job"\n')
-        os.chmod(slurmjobfile, 0o755)
+        parts = ['#! /bin/bash\n\n',
+                 '# image download no dependencies\n',
+                 'image_download_job=$(sbatch ' +
+                 self._generate_download_images_command() + ' | awk \'{print $4}\')\n\n',
+                 '# ppi download no dependencies\n',
+                 'ppi_download_job=$(sbatch ' +
+                 self._generate_download_ppi_command() + ' | awk \'{print $4}\')\n\n',
+                 '# ppi embed\n',
+                 'ppi_embed_job=$(sbatch --dependency=afterok:$ppi_download_job ' +
+                 self._generate_embed_ppi_command() + ' | awk \'{print $4}\')\n\n']
+
+        parts.append('# image embed, one array task per fold\n')
+        parts.append('image_embed_job=$(sbatch --array=' + self._fold_array +
+                     ' --dependency=afterok:$image_download_job ' +
+                     self._generate_embed_image_command() + ' | awk \'{print $4}\')\n\n')
+        parts.append('# co-embedding, each array task waits for image embed task of same fold\n')
+        parts.append('coembed_job=$(sbatch --array=' + self._fold_array +
+                     ' --dependency=aftercorr:$image_embed_job,afterok:$ppi_embed_job ' +
+                     self._generate_coembed_command() + ' | awk \'{print $4}\')\n\n')
+        parts.append('# hierarchy\n')
+        parts.append('hierarchy_job=$(sbatch --dependency=afterok:$ppi_embed_job:$coembed_job ' +
+                     self._generate_hierarchy_command() + ' | awk \'{print $4}\')\n\n')
+        parts.append('echo "job submitted; here is ID of final hierarchy job: $hierarchy_job"\n')
+        parts.append('# hierarchyeval\n')
+        parts.append('hierarchyeval_job=$(sbatch --dependency=afterok:$hierarchy_job ' +
+                     self._generate_hierarchyeval_command() + ' | awk \'{print $4}\')\n\n')
+        parts.append('echo "job submitted; here is ID of final hierarchyeval job: $hierarchyeval_job"\n')
+        self._write_job_script('slurm_cellmaps_job.sh', parts)
 
 
 class ProgrammaticPipelineRunner(PipelineRunner):
     """
-    Runs pipeline programmatically in a serial fashion
+    Runs pipeline programmatically. Steps are run serially unless
+    logging to files is skipped, in which case the image and PPI
+    download and embedding steps are run concurrently
+
+    """
 
+    HIERARCHY_CACHE_SIZE = 4
+    """
+    Maximum number of hierarchies kept in hierarchy cache directory,
+    least recently generated or used are removed first
+    """
+
+    PPI_EDGELIST_HASH_FILE = '.edgelist.hash'
+    """
+    File under PPI embedding directory containing hash
+    of PPI edgelist the embedding was generated from
+    """
+
+    PPI_EMBED_WORKERS = 8
+    """
+    Number of node2vec workers used by PPI embedding step. When
+    run concurrently with image embedding this many CPUs are
+    left for it
     """
 
     def __init__(self, outdir=None,
@@ -412,9 +602,12 @@ class ProgrammaticPipelineRunner(PipelineRunner):
                  fake=None,
                  provenance=None,
                  skip_logging=False,
-                 provenance_utils=ProvenanceUtil(),
+                 provenance_utils=None,
                  fold=[1],
-                 input_data_dict=None):
+                 input_data_dict=None,
+                 async_download=False,
+                 async_limit_per_host=None,
+                 hierarchy_cache_dir=None):
         """
         Constructor
 
@@ -431,9 +624,23 @@ class ProgrammaticPipelineRunner(PipelineRunner):
         :param fake: Uses fake embeddings for testing purposes.
         :param provenance: Provenance information for reproducibility.
         :param skip_logging: Skips logging of pipeline steps if True.
-        :param provenance_utils: Utility for handling provenance data.
+        :param provenance_utils: Utility for handling provenance data. If ``None``
+                                 a new :py:class:`~cellmaps_utils.provenance.ProvenanceUtil`
+                                 is created.
         :param fold: List of fold of image data.
         :param input_data_dict: Dictionary containing input data configurations.
+        :param async_download: If ``True`` download images with
+                               :py:class:`~cellmaps_pipeline.imagedownloader.AsyncImageDownloader`
+                               when ``aiohttp`` is installed.
+        :param async_limit_per_host: Maximum number of simultaneous connections
+                                     to the same host used by
+                                     :py:class:`~cellmaps_pipeline.imagedownloader.AsyncImageDownloader`.
+                                     If ``None`` its default is used
+        :param hierarchy_cache_dir: Directory, outside of **outdir**, where copies
+                                    of generated hierarchies are cached so a removed
+                                    hierarchy directory can be restored without
+                                    regenerating it. If ``None`` no hierarchies are cached
+        :raises CellmapsPipelineError: If **hierarchy_cache_dir** is within **outdir**
         """
         super().__init__(outdir=outdir)
         self._cm4ai_amps = cm4ai_apms
@@ -445,11 +652,25 @@ class ProgrammaticPipelineRunner(PipelineRunner):
         self._model_path = model_path
         self._fake = fake
         self._provenance = provenance
+        if provenance_utils is None:
+            from cellmaps_utils.provenance import ProvenanceUtil
+            provenance_utils = ProvenanceUtil()
         self._provenance_utils = provenance_utils
         self._proteinatlasxml = proteinatlasxml
         self._ppi_cutoffs = ppi_cutoffs
         self._input_data_dict = input_data_dict
         self._skip_logging = skip_logging
+        self._async_download = async_download
+        self._async_limit_per_host = async_limit_per_host
+        self._hierarchy_cache_dir = None
+        if hierarchy_cache_dir is not None:
+            self._hierarchy_cache_dir = os.path.abspath(hierarchy_cache_dir)
+            if os.path.commonpath([self._hierarchy_cache_dir,
+                                   self._outdir]) == self._outdir:
+                raise CellmapsPipelineError('Hierarchy cache directory ' +
+                                            self._hierarchy_cache_dir +
+                                            ' must not be within output directory ' +
+                                            self._outdir)
         self._image_dir = os.path.join(self._outdir,
                                        constants.IMAGE_DOWNLOAD_STEP_DIR)
         self._ppi_dir = os.path.join(self._outdir,
@@ -464,26 +685,76 @@ class ProgrammaticPipelineRunner(PipelineRunner):
 
         self._hierarchy_eval_dir = os.path.join(self._outdir,
                                                 constants.HIERARCHYEVAL_STEP_DIR)
+        self._existing_dirs = None
+        self._reserved_cpus = 0
+
+    def _update_existing_dirs(self):
+        """
+        Scans output directory once with :py:func:`os.scandir` and stores
+        names of subdirectories found in **self._existing_dirs**
+        """
+        try:
+            with os.scandir(self._outdir) as it:
+                self._existing_dirs = {entry.name for entry in it if entry.is_dir()}
+        except FileNotFoundError:
+            self._existing_dirs = set()
+
+    def _is_existing_dir(self, directory):
+        """
+        Checks if **directory**, which must reside in the output directory,
+        exists. If :py:meth:`_update_existing_dirs` has been called, the
+        subdirectories found then are checked, otherwise the filesystem is.
+
+        :param directory: Path to directory in output directory
+        :type directory: str
+        :return: ``True`` if directory exists
+        :rtype: bool
+        """
+        if self._existing_dirs is None:
+            return os.path.isdir(directory)
+        return os.path.basename(directory) in self._existing_dirs
 
     def run(self):
         """
-        Runs pipeline programmatically in serial steps. This would
-        be the same as running the steps in a notebook.
+        Runs pipeline programmatically. This would be the same as
+        running the steps in a notebook.
+
+        The image download and embedding steps share no state with the
+        PPI download and embedding steps, but every step that logs to
+        files reconfigures logging for the whole process via
+        :py:func:`~cellmaps_utils.logutils.setup_filelogger`. Thus the two
+        branches are only run concurrently, in separate threads, if
+        **skip_logging** was set to ``True`` in the constructor, otherwise
+        all steps are run serially. While run concurrently,
+        :py:const:`PPI_EMBED_WORKERS` CPUs are left for node2vec when
+        deciding how many image embedding workers and threads to use.
 
         :raises CellmapsPipelineError: If any step in the pipeline fails, indicating the step and reason.
         :return: Exit code 0 if successful, other values indicate failure.
         """
-        if self._download_images() != 0:
-            raise CellmapsPipelineError('Image download failed')
-
-        if self._download_ppi() != 0:
-            raise CellmapsPipelineError('PPI download failed')
-
-        if self._embed_ppi() != 0:
-            raise CellmapsPipelineError('PPI embed failed')
-
-        if self._embed_image() != 0:
-            raise CellmapsPipelineError('Image embed failed')
+        self._update_existing_dirs()
+        image_steps = [(self._download_images, 'Image download failed'),
+                       (self._embed_image, 'Image embed failed')]
+        ppi_steps = [(self._download_ppi, 'PPI download failed'),
+                     (self._embed_ppi, 'PPI embed failed')]
+        if self._skip_logging is False:
+            self._run_steps([image_steps[0], ppi_steps[0],
+                             ppi_steps[1], image_steps[1]])
+        else:
+            # set by the branch that fails so the other branch does not
+            # start its next step
+            failed = threading.Event()
+            self._reserved_cpus = min(self.PPI_EMBED_WORKERS,
+                                      (os.cpu_count() or 1) - 1)
+            try:
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [executor.submit(self._run_steps, image_steps, failed),
+                               executor.submit(self._run_steps, ppi_steps, failed)]
+                    for future in as_completed(futures):
+                        # raises CellmapsPipelineError if a step failed
+                        future.result()
+            finally:
+                self._reserved_cpus = 0
 
         if self._coembed() != 0:
             raise CellmapsPipelineError('Coembed failed')
@@ -496,13 +767,46 @@ class ProgrammaticPipelineRunner(PipelineRunner):
 
         return 0
 
+    def _run_steps(self, steps, failed=None):
+        """
+        Runs steps in order
+
+        :param steps: (step method, error message) tuples
+        :type steps: list
+        :param failed: If set, by this or another branch of steps, no
+                       further steps are started. This method sets it
+                       when a step fails
+        :type failed: :py:class:`threading.Event`
+        :raises CellmapsPipelineError: With error message of first step
+                                       that returns a non zero exit code
+        :return: 0 upon success or if stopped because **failed** was set
+        :rtype: int
+        """
+        for step, error_msg in steps:
+            if failed is not None and failed.is_set():
+                logger.info('Another step failed, skipping remaining steps')
+                break
+            try:
+                retval = step()
+            except Exception:
+                if failed is not None:
+                    failed.set()
+                raise
+            if retval != 0:
+                if failed is not None:
+                    failed.set()
+                raise CellmapsPipelineError(error_msg)
+        return 0
+
     def _hierarchy_eval(self):
         """
         Evaluates the hierarchy.
 
         :return: Exit code 0 if successful, or if the directory already exists.
         """
-        if os.path.isdir(self._hierarchy_eval_dir):
+        from cellmaps_hierarchyeval.runner import CellmapshierarchyevalRunner
+
+        if self._is_existing_dir(self._hierarchy_eval_dir):
             warnings.warn(
                 'Found hierarchy eval dir, assuming we are good. skipping')
             return 0
@@ -519,17 +823,31 @@ class ProgrammaticPipelineRunner(PipelineRunner):
         :return: Exit code 0 if hierarchy generation is successful or skipped, otherwise logs an error.
         :rtype: int
         """
-        if os.path.isdir(self._hierarchy_dir):
+        from cellmaps_generate_hierarchy.ppi import CosineSimilarityPPIGenerator
+        from cellmaps_generate_hierarchy.hierarchy import CDAPSHiDeFHierarchyGenerator
+        from cellmaps_generate_hierarchy.maturehierarchy import HiDeFHierarchyRefiner
+        from cellmaps_generate_hierarchy.runner import CellmapsGenerateHierarchy
+        from cellmaps_generate_hierarchy.hcx import HCXFromCDAPSCXHierarchy
+
+        if self._is_existing_dir(self._hierarchy_dir):
             warnings.warn(
                 'Found hierarchy dir, assuming we are good. skipping')
             return 0
 
-        coembed_dirs = []
-        for image_coembed_tuple in self._image_coembed_tuples:
-            coembed_dirs.append(image_coembed_tuple[2])
+        if os.path.islink(self._hierarchy_dir):
+            warnings.warn('Removing dangling hierarchy dir link ' +
+                          self._hierarchy_dir)
+            os.unlink(self._hierarchy_dir)
+
+        coembed_dirs = [t[2] for t in self._image_coembed_tuples]
 
         logger.debug('Coembedding directories: ' + str(coembed_dirs))
 
+        cache_dir = self._get_hierarchy_cache_dir(coembed_dirs)
+        if cache_dir is not None and os.path.isdir(cache_dir) \
+                and self._restore_hierarchy_from_cache(cache_dir):
+            return 0
+
         ppigen = CosineSimilarityPPIGenerator(embeddingdirs=coembed_dirs,
                                               cutoffs=self._ppi_cutoffs)
 
@@ -541,104 +859,326 @@ class ProgrammaticPipelineRunner(PipelineRunner):
         hiergen = CDAPSHiDeFHierarchyGenerator(refiner=refiner,
                                                hcxconverter=converter,
                                                provenance_utils=self._provenance_utils)
-        return CellmapsGenerateHierarchy(outdir=self._hierarchy_dir,
-                                         inputdirs=coembed_dirs,
-                                         ppigen=ppigen,
-                                         gene_node_attributes=[self._image_dir, self._ppi_dir],
-                                         hiergen=hiergen,
-                                         skip_logging=self._skip_logging,
-                                         input_data_dict=self._input_data_dict,
-                                         provenance_utils=self._provenance_utils).run()
+        retval = CellmapsGenerateHierarchy(outdir=self._hierarchy_dir,
+                                           inputdirs=coembed_dirs,
+                                           ppigen=ppigen,
+                                           gene_node_attributes=[self._image_dir, self._ppi_dir],
+                                           hiergen=hiergen,
+                                           skip_logging=self._skip_logging,
+                                           input_data_dict=self._input_data_dict,
+                                           provenance_utils=self._provenance_utils).run()
+        if retval == 0 and cache_dir is not None:
+            self._save_hierarchy_to_cache(cache_dir)
+        return retval
+
+    def _get_hierarchy_cache_dir(self, coembed_dirs):
+        """
+        Gets directory where hierarchy generated from **coembed_dirs**
+        is cached. The name of the directory is a hash of the coembedding
+        directories, the image and PPI download directories used for gene
+        node attributes, their modification times, and the PPI cutoffs
+
+        :param coembed_dirs: Coembedding directories
+        :type coembed_dirs: list
+        :return: Path to cache directory or ``None`` if caching is disabled
+                 or any of the directories do not exist
+        :rtype: str
+        """
+        if self._hierarchy_cache_dir is None:
+            return None
+        try:
+            dir_mtimes = sorted((os.path.abspath(d), os.path.getmtime(d)) for d in coembed_dirs)
+            attr_mtimes = [(os.path.abspath(d), os.path.getmtime(d))
+                           for d in (self._image_dir, self._ppi_dir)]
+        except OSError as e:
+            logger.debug('Unable to get modification time of hierarchy input dir: ' + str(e))
+            return None
+        key = hashlib.blake2b(repr((dir_mtimes, attr_mtimes,
+                                    self._ppi_cutoffs)).encode('utf-8')).hexdigest()
+        return os.path.join(self._hierarchy_cache_dir, key)
+
+    @staticmethod
+    def _copy_tree_atomic(src, dst):
+        """
+        Copies directory **src** to temporary directory that is then
+        renamed to **dst** so an incomplete copy is never left at **dst**.
+        Files are copied, not linked, so later changes to either
+        directory do not affect the other
+
+        :param src: Source directory
+        :type src: str
+        :param dst: Destination directory, must not exist
+        :type dst: str
+        :raises OSError: If copy fails
+        """
+        tmp_dir = dst + '.tmp'
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        try:
+            shutil.copytree(src, tmp_dir, symlinks=True)
+            os.replace(tmp_dir, dst)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def _restore_hierarchy_from_cache(self, cache_dir):
+        """
+        Copies hierarchy cached in **cache_dir** to hierarchy directory
+
+        :param cache_dir: Cache directory from :py:meth:`_get_hierarchy_cache_dir`
+        :type cache_dir: str
+        :return: ``True`` if hierarchy was restored, ``False`` if copy failed
+                 in which case the hierarchy needs to be generated
+        :rtype: bool
+        """
+        logger.info('Found cached hierarchy ' + cache_dir +
+                    ' copying to ' + self._hierarchy_dir)
+        try:
+            ProgrammaticPipelineRunner._copy_tree_atomic(cache_dir, self._hierarchy_dir)
+        except OSError as e:
+            logger.warning('Unable to copy cached hierarchy ' + cache_dir + ' : ' + str(e))
+            return False
+        # mark as most recently used
+        os.utime(cache_dir)
+        return True
+
+    def _save_hierarchy_to_cache(self, cache_dir):
+        """
+        Copies hierarchy directory to **cache_dir** via :py:meth:`_copy_tree_atomic`.
+        Oldest cache entries beyond :py:const:`HIERARCHY_CACHE_SIZE` are then removed
+
+        :param cache_dir: Cache directory from :py:meth:`_get_hierarchy_cache_dir`
+        :type cache_dir: str
+        """
+        try:
+            os.makedirs(self._hierarchy_cache_dir, exist_ok=True)
+            ProgrammaticPipelineRunner._copy_tree_atomic(self._hierarchy_dir, cache_dir)
+        except OSError as e:
+            logger.warning('Unable to cache hierarchy in ' + cache_dir + ' : ' + str(e))
+            return
+        self._evict_hierarchy_cache()
+
+    def _evict_hierarchy_cache(self):
+        """
+        Removes least recently generated or used cached hierarchies so no
+        more than :py:const:`HIERARCHY_CACHE_SIZE` remain
+        """
+        with os.scandir(self._hierarchy_cache_dir) as it:
+            entries = sorted((entry for entry in it
+                              if entry.is_dir() and not entry.name.endswith('.tmp')),
+                             key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[ProgrammaticPipelineRunner.HIERARCHY_CACHE_SIZE:]:
+            logger.debug('Removing cached hierarchy ' + entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
 
     def _coembed(self):
         """
         Performs co-embedding of image and PPI data, using either a real or fake data generator based on configuration.
+        Each fold is run in a separate process via :py:class:`concurrent.futures.ProcessPoolExecutor`
 
         :return: Exit code 0 if co-embedding is successful or previously completed,
                  otherwise logs an error and returns non-zero.
         :rtype: int
         """
+        todo_tuples = []
         for image_coembed_tuple in self._image_coembed_tuples:
-            if os.path.isdir(image_coembed_tuple[2]):
+            if self._is_existing_dir(image_coembed_tuple[2]):
                 warnings.warn('Found coembedding dir' +
                               str(image_coembed_tuple[2]) +
                               ', assuming we are good. skipping')
                 continue
-            if self._fake:
-                gen = FakeCoEmbeddingGenerator(ppi_embeddingdir=self._ppi_embed_dir,
-                                               image_embeddingdir=image_coembed_tuple[1])
-            else:
-                gen = MuseCoEmbeddingGenerator(outdir=image_coembed_tuple[2],
-                                               ppi_embeddingdir=self._ppi_embed_dir,
-                                               image_embeddingdir=image_coembed_tuple[1])
-            retval = CellmapsCoEmbedder(outdir=image_coembed_tuple[2],
-                                        inputdirs=[image_coembed_tuple[1],
-                                                   self._ppi_embed_dir],
-                                        embedding_generator=gen,
-                                        skip_logging=self._skip_logging,
-                                        input_data_dict=self._input_data_dict).run()
-            if retval != 0:
-                logger.error('Coembedding ' + image_coembed_tuple[2] +
-                             'using ' + image_coembed_tuple[1] +
-                             ' had non zero exit code of: ' +
-                             str(retval))
-                return retval
+            todo_tuples.append(image_coembed_tuple)
+        if len(todo_tuples) == 0:
+            return 0
+
+        failure = self._run_folds(_run_coembed_fold, todo_tuples,
+                                  self._ppi_embed_dir, self._fake,
+                                  self._input_data_dict, self._skip_logging)
+        if failure is not None:
+            image_coembed_tuple, retval = failure
+            logger.error('Coembedding ' + image_coembed_tuple[2] +
+                         ' using ' + image_coembed_tuple[1] +
+                         ' had non zero exit code of: ' +
+                         str(retval))
+            return retval
         return 0
 
     def _embed_image(self):
         """
         Embeds image data using a specified model, typically a Densenet model.
+        Each fold is run in a separate process via :py:class:`concurrent.futures.ProcessPoolExecutor`
 
         :return: Exit code 0 if the embedding is successful or already completed,
                  otherwise it logs an error and returns non-zero.
         :rtype: int
         """
+        todo_tuples = []
         for image_coembed_tuple in self._image_coembed_tuples:
-            if os.path.isdir(image_coembed_tuple[1]):
+            if self._is_existing_dir(image_coembed_tuple[1]):
                 warnings.warn('Found image_embedding dir' +
                               str(image_coembed_tuple[1]) +
                               ', assuming we are good. skipping')
                 continue
-            if self._fake is True:
-                gen = FakeEmbeddingGenerator(self._image_dir)
-            else:
-                gen = DensenetEmbeddingGenerator(self._image_dir,
-                                                 outdir=image_coembed_tuple[1],
-                                                 model_path=self._model_path,
-                                                 fold=int(image_coembed_tuple[0]))
-            retval = CellmapsImageEmbedder(outdir=image_coembed_tuple[1],
-                                           inputdir=self._image_dir,
-                                           embedding_generator=gen,
-                                           skip_logging=self._skip_logging,
-                                           input_data_dict=self._input_data_dict).run()
-            if retval != 0:
-                logger.error('image embedding ' + image_coembed_tuple[1] +
-                             'using fold' + str(image_coembed_tuple[0] +
-                                                ' had non zero exit code of: ' +
-                                                str(retval)))
-                return retval
+            todo_tuples.append(image_coembed_tuple)
+        if len(todo_tuples) == 0:
+            return 0
+
+        failure = self._run_folds(_run_image_embed_fold, todo_tuples,
+                                  self._image_dir, self._model_path,
+                                  self._fake, self._input_data_dict,
+                                  self._skip_logging)
+        if failure is not None:
+            image_coembed_tuple, retval = failure
+            logger.error('image embedding ' + image_coembed_tuple[1] +
+                         ' using fold' + str(image_coembed_tuple[0]) +
+                         ' had non zero exit code of: ' +
+                         str(retval))
+            return retval
         return 0
 
+    def _run_folds(self, fold_func, todo_tuples, *args):
+        """
+        Runs **fold_func** for each tuple in **todo_tuples** in a separate
+        process via :py:class:`concurrent.futures.ProcessPoolExecutor`.
+        Worker processes are spawned, rather than forked, since this can
+        be called while another thread is running, and each is told to
+        use its share of the CPUs, less any reserved for PPI embedding
+        running at the same time, for torch threads. Spawned workers
+        import the ``__main__`` module, so scripts calling this must
+        guard their code with ``if __name__ == '__main__':``.
+
+        A single tuple gains nothing from a pool and is run in
+        this process instead.
+
+        Once a fold fails, folds not yet started are cancelled and this
+        method returns without waiting for folds still running, which
+        cannot be interrupted.
+
+        :param fold_func: Module level function taking an image coembed tuple,
+                          **args**, and ``num_threads`` keyword argument
+        :type fold_func: callable
+        :param todo_tuples: (fold, image embedding dir, coembedding dir) tuples
+        :type todo_tuples: list
+        :param args: Additional positional arguments passed to **fold_func**
+        :return: (image coembed tuple, exit code) of first fold to return a
+                 non zero exit code or ``None`` if all folds succeeded
+        :rtype: tuple
+        """
+        max_workers = _get_max_workers(len(todo_tuples),
+                                       reserved_cpus=self._reserved_cpus)
+        num_threads = _get_threads_per_worker(max_workers,
+                                              reserved_cpus=self._reserved_cpus)
+        if len(todo_tuples) == 1:
+            retval = fold_func(todo_tuples[0], *args, num_threads=num_threads)
+            if retval != 0:
+                return todo_tuples[0], retval
+            return None
+        executor = ProcessPoolExecutor(max_workers=max_workers,
+                                       mp_context=multiprocessing.get_context('spawn'))
+        futures = {}
+        try:
+            for image_coembed_tuple in todo_tuples:
+                futures[executor.submit(fold_func, image_coembed_tuple, *args,
+                                        num_threads=num_threads)] = image_coembed_tuple
+            for future in as_completed(futures):
+                retval = future.result()
+                if retval != 0:
+                    return futures[future], retval
+            return None
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def _embed_ppi(self):
         """
         Embeds the protein-protein interaction data using the Node2Vec algorithm.
 
+        A hash of the PPI edgelist is stored in the PPI embedding directory
+        and an existing PPI embedding directory is only reused if the stored
+        hash matches the hash of the current PPI edgelist. An existing
+        directory without a stored hash, such as one from an earlier version
+        of this tool, is reused and the current hash is stored in it.
+
+        :raises CellmapsPipelineError: If existing PPI embedding directory was
+                                       generated from a different PPI edgelist
         :return: Exit code 0 if the directory exists or embedding is successful, otherwise logs an error.
         :rtype: int
         """
-        if os.path.isdir(self._ppi_embed_dir):
+        import networkx as nx
+        from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator
+        from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
+
+        edgelist_file = CellMapsPPIEmbedder.get_apms_edgelist_file(self._ppi_dir)
+        try:
+            edgelist_hash = _get_file_hash(edgelist_file)
+        except OSError as e:
+            logger.debug('Unable to hash PPI edgelist: ' + str(e))
+            edgelist_hash = None
+
+        if self._is_existing_dir(self._ppi_embed_dir):
+            if edgelist_hash is None:
+                warnings.warn(
+                    'Found ppi embedding dir, assuming we are good. skipping')
+                return 0
+            stored_hash = self._get_ppi_embed_hash()
+            if stored_hash is None:
+                warnings.warn('Found ppi embedding dir without PPI edgelist hash, '
+                              'assuming it was generated from ' + edgelist_file +
+                              ' and storing hash. skipping')
+                try:
+                    self._write_ppi_embed_hash(edgelist_hash)
+                except OSError as e:
+                    logger.warning('Unable to store PPI edgelist hash in ' +
+                                   self._ppi_embed_dir + ' : ' + str(e))
+                return 0
+            if stored_hash != edgelist_hash:
+                raise CellmapsPipelineError('PPI edgelist ' + edgelist_file +
+                                            ' has changed since ppi embedding dir ' +
+                                            self._ppi_embed_dir + ' was generated. '
+                                            'Remove it, along with co-embedding and '
+                                            'hierarchy directories, and rerun')
             warnings.warn(
                 'Found ppi embedding dir, assuming we are good. skipping')
             return 0
-        gen = Node2VecEmbeddingGenerator(
-            nx_network=nx.read_edgelist(CellMapsPPIEmbedder.get_apms_edgelist_file(self._ppi_dir),
-                                        delimiter='\t'))
 
-        return CellMapsPPIEmbedder(outdir=self._ppi_embed_dir,
-                                   embedding_generator=gen,
-                                   inputdir=self._ppi_dir,
-                                   skip_logging=self._skip_logging,
-                                   input_data_dict=self._input_data_dict).run()
+        gen = Node2VecEmbeddingGenerator(nx_network=nx.read_edgelist(edgelist_file,
+                                                                     delimiter='\t'),
+                                         workers=self.PPI_EMBED_WORKERS)
+
+        retval = CellMapsPPIEmbedder(outdir=self._ppi_embed_dir,
+                                     embedding_generator=gen,
+                                     inputdir=self._ppi_dir,
+                                     skip_logging=self._skip_logging,
+                                     input_data_dict=self._input_data_dict).run()
+        if retval == 0 and edgelist_hash is not None:
+            self._write_ppi_embed_hash(edgelist_hash)
+        return retval
+
+    def _get_ppi_embed_hash(self):
+        """
+        Gets hash of PPI edgelist stored in PPI embedding directory
+
+        :return: Hash or ``None`` if hash file does not exist
+        :rtype: str
+        """
+        try:
+            with open(os.path.join(self._ppi_embed_dir,
+                                   ProgrammaticPipelineRunner.PPI_EDGELIST_HASH_FILE), 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _write_ppi_embed_hash(self, edgelist_hash):
+        """
+        Stores hash of PPI edgelist in PPI embedding directory
+
+        :param edgelist_hash: Hash from :py:func:`_get_file_hash`
+        :type edgelist_hash: str
+        """
+        with open(os.path.join(self._ppi_embed_dir,
+                               ProgrammaticPipelineRunner.PPI_EDGELIST_HASH_FILE), 'w') as f:
+            f.write(edgelist_hash)
 
     def _download_ppi(self):
         """
@@ -649,7 +1189,10 @@ class ProgrammaticPipelineRunner(PipelineRunner):
                  otherwise it continues to handle or log the error.
         :rtype: int
         """
-        if os.path.isdir(self._ppi_dir):
+        from cellmaps_ppidownloader.runner import CellmapsPPIDownloader
+        from cellmaps_ppidownloader.gene import APMSGeneNodeAttributeGenerator, CM4AIGeneNodeAttributeGenerator
+
+        if self._is_existing_dir(self._ppi_dir):
             warnings.warn('Found ppi dir, assuming we are good. skipping')
             return 0
 
@@ -660,6 +1203,8 @@ class ProgrammaticPipelineRunner(PipelineRunner):
                     self._edgelist),
                 apms_baitlist=APMSGeneNodeAttributeGenerator.get_apms_baitlist_from_tsvfile(self._baitlist))
         else:
+            # copy so image download running concurrently does not see this key
+            json_prov = dict(self._provenance)
             json_prov[CellmapsPPIDownloader.CM4AI_ROCRATE] = os.path.abspath(os.path.dirname(self._cm4ai_amps))
             apmsgen = CM4AIGeneNodeAttributeGenerator(apms_edgelist=
                                                       CM4AIGeneNodeAttributeGenerator.get_apms_edgelist_from_tsvfile(
@@ -679,7 +1224,19 @@ class ProgrammaticPipelineRunner(PipelineRunner):
         :return: exit code of :py:meth:`~cellmaps_imagedownloader.runner.CellmapsImageDownloader.run`
         :rtype: int
         """
-        if os.path.isdir(self._image_dir):
+        from cellmaps_imagedownloader.exceptions import CellMapsImageDownloaderError
+        from cellmaps_imagedownloader.runner import MultiProcessImageDownloader
+        from cellmaps_imagedownloader.runner import FakeImageDownloader
+        from cellmaps_imagedownloader.runner import CellmapsImageDownloader
+        from cellmaps_imagedownloader.runner import CM4AICopyDownloader
+        from cellmaps_imagedownloader.gene import ImageGeneNodeAttributeGenerator, CM4AITableConverter
+        from cellmaps_imagedownloader.proteinatlas import ProteinAtlasReader, CM4AIImageCopyTupleGenerator
+        from cellmaps_imagedownloader.proteinatlas import ProteinAtlasImageUrlReader
+        from cellmaps_imagedownloader.proteinatlas import ImageDownloadTupleGenerator
+        from cellmaps_imagedownloader.proteinatlas import LinkPrefixImageDownloadTupleGenerator
+        from cellmaps_pipeline.imagedownloader import AsyncImageDownloader
+
+        if self._is_existing_dir(self._image_dir):
             warnings.warn('Found image dir, assuming we are good. skipping')
             return 0
         logger.info('Downloading images')
@@ -720,7 +1277,20 @@ class ProgrammaticPipelineRunner(PipelineRunner):
         elif self._fake is True:
             warnings.warn('FAKE IMAGES ARE BEING DOWNLOADED!!!!!')
             dloader = FakeImageDownloader()
+        elif self._async_download is True and AsyncImageDownloader.is_aiohttp_available():
+            if self._async_limit_per_host is None:
+                dloader = AsyncImageDownloader()
+            else:
+                if self._async_limit_per_host > AsyncImageDownloader.LIMIT_PER_HOST:
+                    warnings.warn('Downloading more than ' +
+                                  str(AsyncImageDownloader.LIMIT_PER_HOST) +
+                                  ' images at once from the same host can '
+                                  'cause failed downloads, which are skipped')
+                dloader = AsyncImageDownloader(limit_per_host=self._async_limit_per_host)
         else:
+            if self._async_download is True:
+                warnings.warn('aiohttp is not installed, falling back '
+                              'to MultiProcessImageDownloader')
             dloader = MultiProcessImageDownloader()
         # Todo: input_data_dict should NOT be required to run this
         #       https://github.com/idekerlab/cellmaps_imagedownloader/issues/2
@@ -56,6 +56,7 @@ setup(
     ],
     description=desc,
     install_requires=requirements,
+    extras_require={'async': ['aiohttp']},
     license="MIT license",
     long_description=readme + '\n\n' + history,
     long_description_content_type = 'text/x-rst',
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_pipeline` package."""
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import functools
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+from cellmaps_pipeline.imagedownloader import AsyncImageDownloader
+
+
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/badencoding.jpg':
+            body = b'\xff\xfe error'
+            self.send_response(500)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipUnless(AsyncImageDownloader.is_aiohttp_available(), 'aiohttp not installed')
+class TestAsyncImageDownloader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.srcdir = os.path.join(self.temp_dir, 'src')
+        self.destdir = os.path.join(self.temp_dir, 'dest')
+        os.makedirs(self.srcdir)
+        os.makedirs(self.destdir)
+        for i in range(5):
+            with open(os.path.join(self.srcdir, str(i) + '_blue.jpg'), 'w') as f:
+                f.write('image' + str(i))
+        self.server = HTTPServer(('127.0.0.1', 0),
+                                 functools.partial(QuietHTTPRequestHandler,
+                                                   directory=self.srcdir))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:' + str(self.server.server_port) + '/'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.temp_dir)
+
+    def test_download_images(self):
+        download_list = [(self.url + str(i) + '_blue.jpg',
+                          os.path.join(self.destdir, str(i) + '_blue.jpg')) for i in range(5)]
+        download_list.append((self.url + 'doesnotexist.jpg',
+                              os.path.join(self.destdir, 'doesnotexist.jpg')))
+        dloader = AsyncImageDownloader(limit=2)
+        failed = dloader.download_images(download_list=download_list)
+        self.assertEqual(1, len(failed))
+        self.assertEqual(404, failed[0][0])
+        self.assertEqual(download_list[-1], failed[0][2])
+        for i in range(5):
+            with open(os.path.join(self.destdir, str(i) + '_blue.jpg'), 'r') as f:
+                self.assertEqual('image' + str(i), f.read())
+
+    def test_download_images_error_not_valid_utf8(self):
+        download_list = [(self.url + 'badencoding.jpg',
+                          os.path.join(self.destdir, 'badencoding.jpg'))]
+        failed = AsyncImageDownloader().download_images(download_list=download_list)
+        self.assertEqual(1, len(failed))
+        self.assertEqual(500, failed[0][0])
+        self.assertIn('error', failed[0][1])
+        self.assertEqual(download_list[0], failed[0][2])
+
+    def test_default_limit_per_host(self):
+        from cellmaps_imagedownloader.runner import MultiProcessImageDownloader
+        self.assertEqual(MultiProcessImageDownloader.POOL_SIZE,
+                         AsyncImageDownloader()._limit_per_host)
+
+    def test_download_images_skip_existing(self):
+        destfile = os.path.join(self.destdir, '0_blue.jpg')
+        with open(destfile, 'w') as f:
+            f.write('existing')
+        dloader = AsyncImageDownloader(skip_existing=True)
+        self.assertEqual([], dloader.download_images(download_list=[(self.url + '0_blue.jpg',
+                                                                     destfile)]))
+        with open(destfile, 'r') as f:
+            self.assertEqual('existing', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
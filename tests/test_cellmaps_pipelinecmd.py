@@ -34,6 +34,25 @@ class TestCellmaps_pipeline(unittest.TestCase):
         self.assertEqual(res.verbose, 3)
         self.assertEqual(res.logconf, 'hi')
         self.assertEqual('outdir', res.outdir)
+        self.assertFalse(res.async_download)
+
+        self.assertFalse(res.skip_step_logging)
+        self.assertIsNone(res.async_limit_per_host)
+        self.assertIsNone(res.hierarchy_cache_dir)
+
+        res = cellmaps_pipelinecmd._parse_arguments('hi', ['--async',
+                                                           '--async_limit_per_host',
+                                                           '8', 'outdir'])
+        self.assertTrue(res.async_download)
+        self.assertEqual(8, res.async_limit_per_host)
+
+        res = cellmaps_pipelinecmd._parse_arguments('hi', ['--hierarchy_cache_dir',
+                                                           'cache', 'outdir'])
+        self.assertEqual('cache', res.hierarchy_cache_dir)
+
+        res = cellmaps_pipelinecmd._parse_arguments('hi', ['--skip_step_logging',
+                                                           'outdir'])
+        self.assertTrue(res.skip_step_logging)
 
     def test_main(self):
         """Tests main function"""
@@ -70,6 +70,14 @@ class TestPipelineRunner(unittest.TestCase):
         finally:
             shutil.rmtree(temp_dir)
 
+    def test_get_image_coembed_tuples_cached(self):
+        runner = PipelineRunner('foo')
+        other_runner = PipelineRunner('foo')
+        self.assertIs(runner._get_image_coembed_tuples([1, 2]),
+                      other_runner._get_image_coembed_tuples([1, 2]))
+        self.assertIsNot(runner._get_image_coembed_tuples([1, 2]),
+                         runner._get_image_coembed_tuples([1]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,22 +5,57 @@
 import unittest
 
 from cellmaps_imagedownloader.exceptions import CellMapsImageDownloaderError
+from cellmaps_utils import constants
 
+from cellmaps_pipeline import runner
 from cellmaps_pipeline.runner import ProgrammaticPipelineRunner
+from cellmaps_pipeline.exceptions import CellmapsPipelineError
 import os
 import shutil
 from unittest.mock import patch, MagicMock
 
 
+def _write_pid_fold(image_coembed_tuple, retval, num_threads=None):
+    """
+    Fold function that writes id of process it ran in to
+    file named ``pid`` in image embedding dir of
+    **image_coembed_tuple** and returns **retval**
+    """
+    os.makedirs(image_coembed_tuple[1], exist_ok=True)
+    with open(os.path.join(image_coembed_tuple[1], 'pid'), 'w') as f:
+        f.write(str(os.getpid()))
+    return retval
+
+
+def _return_fold(image_coembed_tuple, retval, num_threads=None):
+    """
+    Fold function that only returns **retval**, without writing
+    files that a fold still running after a failure could race
+    with test cleanup
+    """
+    return retval
+
+
 class TestProgrammaticPipelineRunner(unittest.TestCase):
 
     def setUp(self):
         self.outdir = './temp_dir'
+        self.cachedir = './temp_hierarchy_cache'
         self.runner = ProgrammaticPipelineRunner(outdir=self.outdir)
 
     def tearDown(self):
-        if os.path.exists(self.outdir):
-            shutil.rmtree(self.outdir)
+        for directory in (self.outdir, self.cachedir):
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+
+    def test_constructor_provenance_utils(self):
+        self.assertIsNotNone(self.runner._provenance_utils)
+        other_runner = ProgrammaticPipelineRunner(outdir=self.outdir)
+        self.assertIsNot(self.runner._provenance_utils, other_runner._provenance_utils)
+
+        prov_utils = MagicMock()
+        other_runner = ProgrammaticPipelineRunner(outdir=self.outdir, provenance_utils=prov_utils)
+        self.assertIs(prov_utils, other_runner._provenance_utils)
 
     @patch("os.path.isdir", return_value=False)
     def test_image_download_missing_parameters(self, mock_isdir):
@@ -30,6 +65,299 @@ class TestProgrammaticPipelineRunner(unittest.TestCase):
         with self.assertRaises(CellMapsImageDownloaderError):
             self.runner._download_images()
 
+    @patch("os.path.isdir", return_value=True)
+    def test_embed_image_all_folds_exist(self, mock_isdir):
+        self.assertEqual(0, self.runner._embed_image())
+
+    @patch("os.path.isdir", return_value=True)
+    def test_coembed_all_folds_exist(self, mock_isdir):
+        self.assertEqual(0, self.runner._coembed())
+
+    def test_run_folds_in_process_pool(self):
+        myrunner = ProgrammaticPipelineRunner(outdir=self.outdir, fold=[1, 2])
+        os.makedirs(self.outdir)
+        todo_tuples = myrunner._image_coembed_tuples
+        self.assertIsNone(myrunner._run_folds(_write_pid_fold, todo_tuples, 0))
+        for image_coembed_tuple in todo_tuples:
+            with open(os.path.join(image_coembed_tuple[1], 'pid'), 'r') as f:
+                self.assertNotEqual(str(os.getpid()), f.read())
+
+    def test_run_folds_returns_failed_fold(self):
+        myrunner = ProgrammaticPipelineRunner(outdir=self.outdir, fold=[1, 2])
+        todo_tuples = myrunner._image_coembed_tuples
+        self.assertEqual((todo_tuples[0], 3),
+                         myrunner._run_folds(_return_fold, todo_tuples[:1], 3))
+        res = myrunner._run_folds(_return_fold, todo_tuples, 3)
+        self.assertIn(res[0], todo_tuples)
+        self.assertEqual(3, res[1])
+
+    def test_run_folds_single_fold_in_this_process(self):
+        myrunner = ProgrammaticPipelineRunner(outdir=self.outdir)
+        os.makedirs(self.outdir)
+        todo_tuples = myrunner._image_coembed_tuples
+        self.assertIsNone(myrunner._run_folds(_write_pid_fold, todo_tuples, 0))
+        with open(os.path.join(todo_tuples[0][1], 'pid'), 'r') as f:
+            self.assertEqual(str(os.getpid()), f.read())
+
+    def test_get_threads_per_worker(self):
+        with patch('os.cpu_count', return_value=8):
+            self.assertEqual(4, runner._get_threads_per_worker(2))
+            self.assertEqual(1, runner._get_threads_per_worker(16))
+        with patch('os.cpu_count', return_value=None):
+            self.assertEqual(1, runner._get_threads_per_worker(1))
+
+    def test_get_workers_and_threads_with_reserved_cpus(self):
+        with patch('os.cpu_count', return_value=16):
+            self.assertEqual(5, runner._get_max_workers(5, reserved_cpus=8))
+            self.assertEqual(8, runner._get_max_workers(10, reserved_cpus=8))
+            self.assertEqual(2, runner._get_threads_per_worker(4, reserved_cpus=8))
+        with patch('os.cpu_count', return_value=4):
+            self.assertEqual(1, runner._get_max_workers(5, reserved_cpus=8))
+            self.assertEqual(1, runner._get_threads_per_worker(1, reserved_cpus=8))
+
+    def test_is_existing_dir(self):
+        image_dir = os.path.join(os.path.abspath(self.outdir), constants.IMAGE_DOWNLOAD_STEP_DIR)
+        ppi_dir = os.path.join(os.path.abspath(self.outdir), constants.PPI_DOWNLOAD_STEP_DIR)
+        self.runner._update_existing_dirs()
+        self.assertFalse(self.runner._is_existing_dir(image_dir))
+
+        os.makedirs(image_dir)
+        # scan is only done by _update_existing_dirs()
+        self.assertFalse(self.runner._is_existing_dir(image_dir))
+        self.runner._update_existing_dirs()
+        self.assertTrue(self.runner._is_existing_dir(image_dir))
+        self.assertFalse(self.runner._is_existing_dir(ppi_dir))
+
+    def _make_hierarchy_input_dirs(self):
+        self.runner = ProgrammaticPipelineRunner(outdir=self.outdir,
+                                                 hierarchy_cache_dir=self.cachedir)
+        for t in self.runner._image_coembed_tuples:
+            os.makedirs(t[2])
+        os.makedirs(self.runner._image_dir)
+        os.makedirs(self.runner._ppi_dir)
+
+    def _fake_hierarchy_run(self):
+        os.makedirs(self.runner._hierarchy_dir)
+        with open(os.path.join(self.runner._hierarchy_dir, 'hierarchy.cx2'), 'w') as f:
+            f.write('foo')
+        return 0
+
+    def test_hierarchy_uses_cache(self):
+        self._make_hierarchy_input_dirs()
+
+        with patch('cellmaps_generate_hierarchy.runner.CellmapsGenerateHierarchy') as mock_gen:
+            mock_gen.return_value.run.side_effect = self._fake_hierarchy_run
+            self.assertEqual(0, self.runner._hierarchy())
+            self.assertEqual(1, mock_gen.call_count)
+
+            cache_dir = self.runner._get_hierarchy_cache_dir([t[2] for t in self.runner._image_coembed_tuples])
+            self.assertTrue(os.path.isfile(os.path.join(cache_dir, 'hierarchy.cx2')))
+
+            shutil.rmtree(self.runner._hierarchy_dir)
+            self.assertEqual(0, self.runner._hierarchy())
+            self.assertEqual(1, mock_gen.call_count)
+            self.assertFalse(os.path.islink(self.runner._hierarchy_dir))
+            hier_file = os.path.join(self.runner._hierarchy_dir, 'hierarchy.cx2')
+            self.assertTrue(os.path.isfile(hier_file))
+
+            # rewriting restored hierarchy in place must not change cache
+            with open(hier_file, 'w') as f:
+                f.write('bar')
+            with open(os.path.join(cache_dir, 'hierarchy.cx2'), 'r') as f:
+                self.assertEqual('foo', f.read())
+
+            # hierarchy must survive removal of the cache
+            shutil.rmtree(self.cachedir)
+            with open(hier_file, 'r') as f:
+                self.assertEqual('bar', f.read())
+        # nothing is cached in output directory
+        self.assertEqual([], [d for d in os.listdir(self.outdir) if d.startswith('.')])
+
+    def test_hierarchy_cache_disabled_by_default(self):
+        for t in self.runner._image_coembed_tuples:
+            os.makedirs(t[2])
+        os.makedirs(self.runner._image_dir)
+        os.makedirs(self.runner._ppi_dir)
+        self.assertIsNone(self.runner._get_hierarchy_cache_dir([t[2] for t in
+                                                                self.runner._image_coembed_tuples]))
+
+    def test_hierarchy_cache_dir_within_outdir(self):
+        with self.assertRaises(CellmapsPipelineError) as ce:
+            ProgrammaticPipelineRunner(outdir=self.outdir,
+                                       hierarchy_cache_dir=os.path.join(self.outdir, 'cache'))
+        self.assertTrue('must not be within output directory' in str(ce.exception))
+
+    def test_hierarchy_removes_dangling_link(self):
+        self._make_hierarchy_input_dirs()
+        os.symlink(os.path.join(self.outdir, 'doesnotexist'), self.runner._hierarchy_dir)
+        self.runner._update_existing_dirs()
+        with patch('cellmaps_generate_hierarchy.runner.CellmapsGenerateHierarchy') as mock_gen:
+            mock_gen.return_value.run.side_effect = self._fake_hierarchy_run
+            self.assertEqual(0, self.runner._hierarchy())
+            self.assertEqual(1, mock_gen.call_count)
+        self.assertFalse(os.path.islink(self.runner._hierarchy_dir))
+        self.assertTrue(os.path.isfile(os.path.join(self.runner._hierarchy_dir, 'hierarchy.cx2')))
+
+    def test_get_hierarchy_cache_dir_includes_download_dirs(self):
+        self._make_hierarchy_input_dirs()
+        coembed_dirs = [t[2] for t in self.runner._image_coembed_tuples]
+        cache_dir = self.runner._get_hierarchy_cache_dir(coembed_dirs)
+        os.utime(self.runner._ppi_dir, (1, 1))
+        self.assertNotEqual(cache_dir, self.runner._get_hierarchy_cache_dir(coembed_dirs))
+        shutil.rmtree(self.runner._image_dir)
+        self.assertIsNone(self.runner._get_hierarchy_cache_dir(coembed_dirs))
+
+    def test_hierarchy_cache_eviction(self):
+        self.runner = ProgrammaticPipelineRunner(outdir=self.outdir,
+                                                 hierarchy_cache_dir=self.cachedir)
+        os.makedirs(self.runner._hierarchy_dir)
+        cache_root = self.cachedir
+        num_entries = ProgrammaticPipelineRunner.HIERARCHY_CACHE_SIZE + 2
+        for i in range(num_entries):
+            cache_dir = os.path.join(cache_root, str(i))
+            self.runner._save_hierarchy_to_cache(cache_dir)
+            os.utime(cache_dir, (i, i))
+        self.runner._evict_hierarchy_cache()
+        self.assertEqual(sorted(str(i) for i in range(2, num_entries)),
+                         sorted(os.listdir(cache_root)))
+
+    def test_get_hierarchy_cache_dir_missing_coembed_dir(self):
+        self.runner = ProgrammaticPipelineRunner(outdir=self.outdir,
+                                                 hierarchy_cache_dir=self.cachedir)
+        self.assertIsNone(self.runner._get_hierarchy_cache_dir([os.path.join(self.outdir, 'doesnotexist')]))
+
+    def _write_ppi_edgelist(self, data):
+        os.makedirs(self.runner._ppi_dir, exist_ok=True)
+        with open(os.path.join(self.runner._ppi_dir, constants.PPI_EDGELIST_FILE), 'w') as f:
+            f.write(data)
+
+    def test_embed_ppi_edgelist_hash_matches(self):
+        self._write_ppi_edgelist('geneA\tgeneB\nA\tB\n')
+        os.makedirs(self.runner._ppi_embed_dir)
+        with open(os.path.join(self.runner._ppi_embed_dir,
+                               ProgrammaticPipelineRunner.PPI_EDGELIST_HASH_FILE), 'w') as f:
+            f.write(runner._get_file_hash(os.path.join(self.runner._ppi_dir,
+                                                       constants.PPI_EDGELIST_FILE)))
+        with patch('cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder.run') as mock_run:
+            self.assertEqual(0, self.runner._embed_ppi())
+            mock_run.assert_not_called()
+
+    def test_embed_ppi_edgelist_hash_differs(self):
+        self._write_ppi_edgelist('geneA\tgeneB\nA\tB\nB\tC\n')
+        os.makedirs(self.runner._ppi_embed_dir)
+        existing_file = os.path.join(self.runner._ppi_embed_dir, 'ppi_emd.tsv')
+        open(existing_file, 'w').close()
+        hash_file = os.path.join(self.runner._ppi_embed_dir,
+                                 ProgrammaticPipelineRunner.PPI_EDGELIST_HASH_FILE)
+        with open(hash_file, 'w') as f:
+            f.write('oldhash')
+        with patch('cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder.run') as mock_run:
+            with self.assertRaises(CellmapsPipelineError) as ce:
+                self.runner._embed_ppi()
+            mock_run.assert_not_called()
+        self.assertTrue('has changed since ppi embedding dir' in str(ce.exception))
+        self.assertTrue(os.path.isfile(existing_file))
+        with open(hash_file, 'r') as f:
+            self.assertEqual('oldhash', f.read())
+
+    def test_embed_ppi_no_edgelist_hash(self):
+        self._write_ppi_edgelist('geneA\tgeneB\nA\tB\n')
+        os.makedirs(self.runner._ppi_embed_dir)
+        existing_file = os.path.join(self.runner._ppi_embed_dir, 'ppi_emd.tsv')
+        open(existing_file, 'w').close()
+        with patch('cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder.run') as mock_run:
+            self.assertEqual(0, self.runner._embed_ppi())
+            mock_run.assert_not_called()
+        self.assertTrue(os.path.isfile(existing_file))
+        self.assertEqual(runner._get_file_hash(os.path.join(self.runner._ppi_dir,
+                                                            constants.PPI_EDGELIST_FILE)),
+                         self.runner._get_ppi_embed_hash())
+
+    def test_embed_ppi_no_edgelist_hash_read_only_dir(self):
+        self._write_ppi_edgelist('geneA\tgeneB\nA\tB\n')
+        os.makedirs(self.runner._ppi_embed_dir)
+        with patch.object(self.runner, '_write_ppi_embed_hash',
+                          side_effect=PermissionError('read only')):
+            with patch('cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder.run') as mock_run:
+                self.assertEqual(0, self.runner._embed_ppi())
+                mock_run.assert_not_called()
+        self.assertIsNone(self.runner._get_ppi_embed_hash())
+
+    def test_embed_ppi_writes_edgelist_hash(self):
+        self._write_ppi_edgelist('geneA\tgeneB\nA\tB\n')
+        with patch('cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder.run',
+                   side_effect=lambda: os.makedirs(self.runner._ppi_embed_dir) or 0) as mock_run:
+            self.assertEqual(0, self.runner._embed_ppi())
+            mock_run.assert_called_once()
+        self.assertEqual(runner._get_file_hash(os.path.join(self.runner._ppi_dir,
+                                                            constants.PPI_EDGELIST_FILE)),
+                         self.runner._get_ppi_embed_hash())
+
+    def test_run_ppi_download_fails(self):
+        self.runner._download_images = MagicMock(return_value=0)
+        self.runner._embed_image = MagicMock(return_value=0)
+        self.runner._download_ppi = MagicMock(return_value=1)
+        self.runner._embed_ppi = MagicMock(return_value=0)
+        self.runner._coembed = MagicMock(return_value=0)
+        with self.assertRaises(CellmapsPipelineError) as ce:
+            self.runner.run()
+        self.assertEqual('PPI download failed', str(ce.exception))
+        self.runner._download_images.assert_called_once()
+        self.runner._embed_image.assert_not_called()
+        self.runner._embed_ppi.assert_not_called()
+        self.runner._coembed.assert_not_called()
+
+    def test_run_concurrent_ppi_download_fails_stops_image_branch(self):
+        myrunner = ProgrammaticPipelineRunner(outdir=self.outdir, skip_logging=True)
+        events = []
+        run_steps = myrunner._run_steps
+
+        def capture_failed_event(steps, failed=None):
+            events.append(failed)
+            return run_steps(steps, failed)
+
+        def download_images():
+            # finish only after the PPI branch has failed
+            self.assertTrue(events[0].wait(10))
+            return 0
+
+        myrunner._run_steps = capture_failed_event
+        myrunner._download_images = MagicMock(side_effect=download_images)
+        myrunner._embed_image = MagicMock(return_value=0)
+        myrunner._download_ppi = MagicMock(return_value=1)
+        myrunner._embed_ppi = MagicMock(return_value=0)
+        myrunner._coembed = MagicMock(return_value=0)
+        with self.assertRaises(CellmapsPipelineError) as ce:
+            myrunner.run()
+        self.assertEqual('PPI download failed', str(ce.exception))
+        myrunner._download_images.assert_called_once()
+        myrunner._embed_image.assert_not_called()
+        myrunner._embed_ppi.assert_not_called()
+        myrunner._coembed.assert_not_called()
+
+    def test_run_steps_serial_when_logging_to_files(self):
+        calls = []
+        for name in ['_download_images', '_download_ppi', '_embed_ppi', '_embed_image',
+                     '_coembed', '_hierarchy', '_hierarchy_eval']:
+            setattr(self.runner, name, MagicMock(side_effect=lambda name=name: calls.append(name) or 0))
+        with patch('cellmaps_pipeline.runner.ThreadPoolExecutor') as mock_executor:
+            self.assertEqual(0, self.runner.run())
+            mock_executor.assert_not_called()
+        self.assertEqual(['_download_images', '_download_ppi', '_embed_ppi', '_embed_image',
+                          '_coembed', '_hierarchy', '_hierarchy_eval'], calls)
+
+    def test_run_image_embed_fails(self):
+        self.runner._download_images = MagicMock(return_value=0)
+        self.runner._embed_image = MagicMock(return_value=2)
+        self.runner._download_ppi = MagicMock(return_value=0)
+        self.runner._embed_ppi = MagicMock(return_value=0)
+        self.runner._coembed = MagicMock(return_value=0)
+        with self.assertRaises(CellmapsPipelineError) as ce:
+            self.runner.run()
+        self.assertEqual('Image embed failed', str(ce.exception))
+        self.runner._embed_ppi.assert_called_once()
+        self.runner._coembed.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -26,16 +26,13 @@ class TestSLURMPipelineRunner(unittest.TestCase):
         myobj = SLURMPipelineRunner('foo')
         self.assertIsNotNone(myobj)
 
-    def test_write_slurm_directives(self):
+    def test_get_slurm_directives(self):
         temp_dir = tempfile.mkdtemp()
         try:
             myobj = SLURMPipelineRunner(temp_dir)
-            filename = os.path.join(temp_dir, 'foo.txt')
-            with open(filename, 'w') as f:
-                myobj._write_slurm_directives(out=f)
-            with open(filename, 'r') as f:
-                data = f.read().split('\n')
+            data = myobj._get_slurm_directives(job_name='foo').split('\n')
             self.assertEqual('#!/bin/bash', data[0])
+            self.assertTrue('#SBATCH --job-name=foo' in data)
         finally:
             shutil.rmtree(temp_dir)
 
@@ -68,9 +65,13 @@ class TestSLURMPipelineRunner(unittest.TestCase):
         temp_dir = tempfile.mkdtemp()
         try:
             myobj = SLURMPipelineRunner(temp_dir)
-            filename = os.path.join(temp_dir, 'imageembedjob1.sh')
-            myobj._generate_embed_image_command()
+            filename = os.path.join(temp_dir, 'imageembedjob.sh')
+            self.assertEqual('imageembedjob.sh', myobj._generate_embed_image_command())
             self.assertTrue(os.path.isfile(filename))
+            with open(filename, 'r') as f:
+                data = f.read()
+            self.assertTrue('fold=$SLURM_ARRAY_TASK_ID\n' in data)
+            self.assertTrue('cellmaps_image_embeddingcmd.py $image_embed_dir --fold $fold' in data)
         finally:
             shutil.rmtree(temp_dir)
 
@@ -88,9 +89,13 @@ class TestSLURMPipelineRunner(unittest.TestCase):
         temp_dir = tempfile.mkdtemp()
         try:
             myobj = SLURMPipelineRunner(temp_dir)
-            filename = os.path.join(temp_dir, 'coembeddingjob1.sh')
-            myobj._generate_coembed_command(fold=1)
+            filename = os.path.join(temp_dir, 'coembeddingjob.sh')
+            self.assertEqual('coembeddingjob.sh', myobj._generate_coembed_command())
             self.assertTrue(os.path.isfile(filename))
+            with open(filename, 'r') as f:
+                data = f.read()
+            self.assertTrue('fold=$SLURM_ARRAY_TASK_ID\n' in data)
+            self.assertTrue('cellmaps_coembeddingcmd.py $coembed_dir' in data)
         finally:
             shutil.rmtree(temp_dir)
 
@@ -119,3 +124,22 @@ class TestSLURMPipelineRunner(unittest.TestCase):
             self.assertTrue(os.path.isfile(filename))
         finally:
             shutil.rmtree(temp_dir)
+
+    def test_slurm_run_job_arrays(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            myobj = SLURMPipelineRunner(temp_dir, samples='test_samples', unique='test_unique',
+                                        edgelist='edgelist', baitlist='baitlist',
+                                        provenance='test_provenance', fold=[1, 3])
+            myobj.run()
+            with open(os.path.join(temp_dir, 'slurm_cellmaps_job.sh'), 'r') as f:
+                data = f.read()
+            self.assertTrue('image_embed_job=$(sbatch --array=1,3 '
+                            '--dependency=afterok:$image_download_job imageembedjob.sh' in data)
+            self.assertTrue('coembed_job=$(sbatch --array=1,3 '
+                            '--dependency=aftercorr:$image_embed_job,afterok:$ppi_embed_job '
+                            'coembeddingjob.sh' in data)
+            self.assertTrue('--dependency=afterok:$ppi_embed_job:$coembed_job hierarchyjob.sh' in data)
+            self.assertEqual(1, data.count('imageembedjob'))
+        finally:
+            shutil.rmtree(temp_dir)